@@ -15,9 +15,36 @@ Each Enum provides methods to retrieve the corresponding frequency spectrum and
 """
 import os
 import enum
+import functools
 import numpy as np
-import pandas as pd
-import scipy.signal as scipy
+import scipy.fft as scipy_fft
+import scipy.signal as scipy_signal
+
+
+_rng = np.random.default_rng()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_table(name: str) -> [np.array, np.array]:
+    """Load a spectrum table, keeping it cached for subsequent calls.
+
+    The tables are read from data/tables.npz, built from the csv files by data/build_tables.py.
+
+    Args:
+        name (str): Name of the table (rain, sea or shipping).
+
+    Returns:
+        np.array: Frequencies in Hz.
+        np.array: Spectrum matrix (one column per level) in dB ref 1μPa @1m/Hz.
+    """
+    with np.load(os.path.join(os.path.dirname(__file__), "data", "tables.npz")) as tables:
+        table = tables[name]
+    frequencies = table[:, 0]
+    spectra = table[:, 1:]
+    # arrays compartilhados entre chamadas, protegidos contra escrita
+    frequencies.setflags(write=False)
+    spectra.setflags(write=False)
+    return frequencies, spectra
 
 
 class Rain(enum.Enum):
@@ -30,8 +57,8 @@ class Rain(enum.Enum):
     VERY_HEAVY = 4 #(100 mm/h)
     
     @staticmethod
-    def __get_csv() -> str:
-        return os.path.join(os.path.dirname(__file__), "data", "rain.csv")
+    def __get_table() -> str:
+        return "rain"
 
     def __str__(self):
         if self == Rain.NONE:
@@ -44,28 +71,27 @@ class Rain(enum.Enum):
             np.array: Frequencies in Hz.
             np.array: Estimate spectrum in dB ref 1μPa @1m/Hz.
         """
-        df = pd.read_csv(Rain.__get_csv())
-        frequencies = df[df.columns[0]].values
+        frequencies, spectra = _load_table(Rain.__get_table())
         if self != Rain.NONE:
-            spectrum = df[df.columns[self.value]].values
+            spectrum = spectra[:, self.value - 1].copy()
         else:
             spectrum = np.zeros(frequencies.size)
-        return frequencies, spectrum
+        return frequencies.copy(), spectrum
     
-    def get_noise(self, n_samples: int, fs: float) -> np.array:
+    def get_noise(self, n_samples: int, fs: float, rng: np.random.Generator = None) -> np.array:
         """Get the signal of the rain noise
 
         Args:
             n_samples (int): number of samples
             fs (float): sample frequency (Hz)
+            rng (np.random.Generator): random generator, for reproducible noise. Defaults to the module generator.
 
         Returns:
             np.array: Synthetic noise in μPa.
         """
         if self != Rain.NONE:
-            frequencies, spectrum = self.get_spectrum()
-            return generate_noise(frequencies, spectrum, n_samples, fs)
-        return np.zeros(n_samples)
+            return _generate_source_noise(self, n_samples, fs, rng)
+        return np.zeros(n_samples, dtype=np.float32)
 
 
 class Sea(enum.Enum):
@@ -78,8 +104,8 @@ class Sea(enum.Enum):
     STATE_6 = 6
 
     @staticmethod
-    def __get_csv() -> str:
-        return os.path.join(os.path.dirname(__file__), "data", "sea_state.csv")
+    def __get_table() -> str:
+        return "sea"
     
     def __str__(self):
         return f"sea state {self.value}"
@@ -90,23 +116,22 @@ class Sea(enum.Enum):
             np.array: Frequencies in Hz.
             np.array: Estimate spectrum in dB ref 1μPa @1m/Hz.
         """
-        df = pd.read_csv(Sea.__get_csv())
-        frequencies = df[df.columns[0]].values
-        spectrum = df[df.columns[self.value + 1]].values
-        return frequencies, spectrum
+        frequencies, spectra = _load_table(Sea.__get_table())
+        spectrum = spectra[:, self.value].copy()
+        return frequencies.copy(), spectrum
 
-    def get_noise(self, n_samples: int, fs: float) -> np.array:
+    def get_noise(self, n_samples: int, fs: float, rng: np.random.Generator = None) -> np.array:
         """Get the signal of the sea state
 
         Args:
             n_samples (int): number of samples
             fs (float): sample frequency (Hz)
+            rng (np.random.Generator): random generator, for reproducible noise. Defaults to the module generator.
 
         Returns:
             np.array: Synthetic noise in μPa.
         """
-        frequencies, spectrum = self.get_spectrum()
-        return generate_noise(frequencies, spectrum, n_samples, fs)
+        return _generate_source_noise(self, n_samples, fs, rng)
 
 
 class Shipping(enum.Enum):
@@ -120,8 +145,8 @@ class Shipping(enum.Enum):
     LEVEL_7 = 7
 
     @staticmethod
-    def __get_csv() -> str:
-        return os.path.join(os.path.dirname(__file__), "data", "shipping_noise.csv")
+    def __get_table() -> str:
+        return "shipping"
     
     def __str__(self):
         if self == Shipping.NONE:
@@ -134,31 +159,102 @@ class Shipping(enum.Enum):
             np.array: Frequencies in Hz.
             np.array: Estimate spectrum in dB ref 1μPa @1m/Hz.
         """
-        df = pd.read_csv(Shipping.__get_csv())
-        frequencies = df[df.columns[0]].values        
+        frequencies, spectra = _load_table(Shipping.__get_table())
         if self != Shipping.NONE:
-            spectrum = df[df.columns[self.value]].values
+            spectrum = spectra[:, self.value - 1].copy()
         else:
             spectrum = np.zeros(frequencies.size)
-        return frequencies, spectrum
+        return frequencies.copy(), spectrum
 
-    def get_noise(self, n_samples: int, fs: float) -> np.array:
+    def get_noise(self, n_samples: int, fs: float, rng: np.random.Generator = None) -> np.array:
         """Get the signal of the shipping noise
 
         Args:
             n_samples (int): number of samples
             fs (float): sample frequency (Hz)
+            rng (np.random.Generator): random generator, for reproducible noise. Defaults to the module generator.
 
         Returns:
             np.array: Synthetic noise in μPa.
         """
         if self != Shipping.NONE:
-            frequencies, spectrum = self.get_spectrum()
-            return generate_noise(frequencies, spectrum, n_samples, fs)
-        return np.zeros(n_samples)
+            return _generate_source_noise(self, n_samples, fs, rng)
+        return np.zeros(n_samples, dtype=np.float32)
+
 
+def _design_response(frequencies: np.array, intensities: np.array, n_fft: int, fs: float) -> np.array:
+    """Design the magnitude response used to shape white noise.
 
-def generate_noise(frequencies: np.array, intensities: np.array, n_samples: int, fs: float) -> np.array:
+    Args:
+        frequencies (np.array): Array of frequency values.
+        intensities (np.array): Array of intensity values in dB ref 1μPa @1m/Hz.
+        n_fft (int): Number of points of the fft.
+        fs (float): Sampling frequency.
+
+    Returns:
+        np.array: Linear magnitude response at each rfft bin (float32).
+    """
+
+    # tabela terminando antes de fs/2: estendendo-a até fs/2 pela reta dos dois últimos pontos
+    if frequencies[-1] < fs/2:
+        slope = (intensities[-1] - intensities[-2]) / (frequencies[-1] - frequencies[-2])
+        intensities = np.append(intensities, intensities[-1] + slope * (fs/2 - frequencies[-1]))
+        frequencies = np.append(frequencies, fs/2)
+
+    # garantindo que as frequências contenham as frequências 0 e fs/2 e estejam limitadas ao critério de nyquist
+    #   (abaixo da tabela a intensidade é mantida constante)
+    grid = np.unique(np.concatenate(([0.0, fs/2], frequencies[frequencies < fs/2])))
+    intensities = np.interp(grid, frequencies, intensities)
+    # normalizando frequências entre 0 e 1
+    frequencies = grid/(fs/2)
+
+    # convertendo para escala linear sobre o próprio array interpolado, sem novas alocações
+    np.multiply(intensities, 1/20, out=intensities)
+    np.power(10.0, intensities, out=intensities)
+
+    bins = scipy_fft.rfftfreq(n_fft, 1/fs) / (fs/2)
+    return np.interp(bins, frequencies, intensities).astype(np.float32)
+
+@functools.lru_cache(maxsize=16)
+def _source_response(source: enum.Enum, n_fft: int, fs: float) -> np.array:
+    """Magnitude response of a background noise source, cached by source, n_fft and fs."""
+    frequencies, spectrum = source.get_spectrum()
+    response = _design_response(frequencies, spectrum, n_fft, fs)
+    response.setflags(write=False)
+    return response
+
+def _shape_noise(response: np.array, n_samples: int, n_fft: int, rng: np.random.Generator = None) -> np.array:
+    """Generate white noise and shape it in frequency domain by the given response.
+
+    Args:
+        response (np.array): Linear magnitude response at each rfft bin, in the last axis. A 2D response
+            (one row per signal) generates a batch of signals with a single batched fft.
+        n_samples (int): Number of samples to generate.
+        n_fft (int): Number of points of the fft, at least n_samples.
+        rng (np.random.Generator): Random generator of the white noise. Defaults to the module generator.
+
+    Returns:
+        np.array: Generated noise in μPa, with n_samples in the last axis.
+    """
+    # modelando o ruído diretamente no domínio da frequência: o ruído branco é multiplicado pela
+    #   resposta em magnitude desejada (interpolada nos bins da rfft), equivalente a um filtro de fase zero
+    # float32 em todo o processamento: faixa dinâmica suficiente com metade do tráfego de memória
+    noise = np.empty(response.shape[:-1] + (n_fft,), dtype=np.float32)
+    if rng is None:
+        rng = _rng
+    rng.standard_normal(dtype=np.float32, out=noise)
+
+    spectrum = scipy_fft.rfft(noise, axis=-1, workers=-1)
+    np.multiply(spectrum, response, out=spectrum)
+    out_noise = scipy_fft.irfft(spectrum, n_fft, axis=-1, workers=-1)
+    return out_noise[..., :n_samples]
+
+def _generate_source_noise(source: enum.Enum, n_samples: int, fs: float, rng: np.random.Generator = None) -> np.array:
+    """Generate the noise of a background noise source reusing its cached response."""
+    n_fft = scipy_fft.next_fast_len(n_samples, real=True)
+    return _shape_noise(_source_response(source, n_fft, fs), n_samples, n_fft, rng)
+
+def generate_noise(frequencies: np.array, intensities: np.array, n_samples: int, fs: float, rng: np.random.Generator = None) -> np.array:
     """Generate background noise based on frequency and intensity information.
 
     Args:
@@ -166,6 +262,7 @@ def generate_noise(frequencies: np.array, intensities: np.array, n_samples: int,
         intensities (np.array): Array of intensity values in dB ref 1μPa @1m/Hz.
         n_samples (int): Number of samples to generate.
         fs (float): Sampling frequency.
+        rng (np.random.Generator): Random generator, for reproducible noise. Defaults to the module generator.
 
     Returns:
         np.array: Generated background noise in μPa.
@@ -178,50 +275,35 @@ def generate_noise(frequencies: np.array, intensities: np.array, n_samples: int,
     if len(frequencies) != len(intensities):
         raise UnboundLocalError("for generate_noise frequencies and intensities must have the same length")
 
-    # garantindo que as frequências inseridas contenham as frequência 0 e fs/2 (exigido pela scipy.firwin2)
-    #   e estejam limitadas ao critério de nyquist
-    index = np.argmax(frequencies > (fs/2.0))
-    if index > 0:
-        if frequencies[index-1] == (fs/2):
-            frequencies = frequencies[:index]
-            intensities = intensities[:index]
-        else:
-            f = fs/2
-            i = intensities[index-1] + (intensities[index]-intensities[index-1])*(f-frequencies[index-1])/(frequencies[index]-frequencies[index-1])
-            
-            frequencies = np.append(frequencies[:index], f)
-            intensities = np.append(intensities[:index], i)
-    else:
-        if frequencies[-1] != (fs/2):
-            f = fs/2
-            i = intensities[-1] + (intensities[-1]-intensities[-2])*(f-frequencies[-2])/(frequencies[-1]-frequencies[-2])
-
-            frequencies = np.append(frequencies, f)
-            intensities = np.append(intensities, i)
-
-    if frequencies[0] != 0:
-            frequencies = np.append(0, frequencies)
-            intensities = np.append(intensities[0], intensities)
-
-    # normalizando frequências entre 0 e 1
-    if np.max(frequencies) > 1:
-        frequencies = frequencies/(fs/2)
-
-    order = 1025
-    noise = np.random.normal(0, 1.13, n_samples + order)
-    # 1.13 ajustado manualmente com base na aplicação de teste generate_noise.py para compensar um offset
-    # gerando mais amostras que o desejado para eliminar a resposta transiente do filtro
-
-    intensities = 10 ** ((intensities) / 20)
-
-    coeficient = scipy.firwin2(order, frequencies, intensities, antisymmetric=False)
-    # https://docs.scipy.org/doc/scipy/reference/generated/scipy.signal.firwin2.html
-    # antisymmetric=False, order=odd
-    # filtro tipo 1 para que as frequências fs/2 e 0 não tenham que ser 0
-    out_noise = scipy.lfilter(coeficient, 1, noise)
-    return out_noise[order:]
-
-def generate_bg_noise(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping = Shipping.NONE, n_samples: int = 1024, fs: float = 48000) -> np.array:
+    n_fft = scipy_fft.next_fast_len(n_samples, real=True)
+    response = _design_response(frequencies, intensities, n_fft, fs)
+    return _shape_noise(response, n_samples, n_fft, rng)
+
+@functools.lru_cache(maxsize=16)
+def _source_psd(source: enum.Enum, n_fft: int, fs: float) -> np.array:
+    """Linear power spectrum of a background noise source at each rfft bin, cached by source, n_fft and fs."""
+    frequencies, spectrum = source.get_spectrum()
+    psd = _design_response(frequencies, spectrum, n_fft, fs)
+    np.square(psd, out=psd)
+    psd.setflags(write=False)
+    return psd
+
+def _bg_response(sea: Sea, rain: Rain, shipping: Shipping, n_fft: int, fs: float, out: np.array = None) -> np.array:
+    """Combined magnitude response of sea state, rain and shipping noise at each rfft bin."""
+    # fontes independentes: as potências se somam, então um único ruído modelado pela resposta
+    #   sqrt(sum |H_i|^2) é estatisticamente equivalente à soma dos ruídos de cada fonte
+    # as potências de cada fonte são calculadas uma única vez e reaproveitadas entre as combinações,
+    #   restando apenas as somas (acumulando a partir do estado do mar e ignorando chuva e navegação quando ausentes)
+    if out is None:
+        out = np.empty(n_fft//2 + 1, dtype=np.float32)
+    np.copyto(out, _source_psd(sea, n_fft, fs))
+    if rain is not Rain.NONE:
+        out += _source_psd(rain, n_fft, fs)
+    if shipping is not Shipping.NONE:
+        out += _source_psd(shipping, n_fft, fs)
+    return np.sqrt(out, out=out)
+
+def generate_bg_noise(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping = Shipping.NONE, n_samples: int = 1024, fs: float = 48000, rng: np.random.Generator = None) -> np.array:
     """Generate background noise by combining sea state, rain and shipping noise.
 
     Args:
@@ -230,12 +312,43 @@ def generate_bg_noise(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping = Shi
         shipping (Shipping): Enum representing shipping noise conditions.
         n_samples (int): Number of samples to generate.
         fs (float): Sampling frequency.
+        rng (np.random.Generator): Random generator, for reproducible noise. Defaults to the module generator.
 
     Returns:
         np.array: Combined background noise in μPa.
 
     """
-    return sea.get_noise(n_samples, fs) + rain.get_noise(n_samples, fs) + shipping.get_noise(n_samples, fs)
+    n_fft = scipy_fft.next_fast_len(n_samples, real=True)
+    return _shape_noise(_bg_response(sea, rain, shipping, n_fft, fs), n_samples, n_fft, rng)
+
+def generate_bg_noise_batch(seas: [Sea], rains: [Rain], shippings: [Shipping], n_samples: int = 1024, fs: float = 48000, rng: np.random.Generator = None) -> np.array:
+    """Generate background noise for several combinations of sea state, rain and shipping noise at once.
+
+    All signals are shaped by a single batched fft, sharing the fft setup between combinations.
+
+    Args:
+        seas ([Sea]): Sea state conditions, one per signal (Enum members or their values).
+        rains ([Rain]): Rain conditions, one per signal (Enum members or their values).
+        shippings ([Shipping]): Shipping noise conditions, one per signal (Enum members or their values).
+        n_samples (int): Number of samples to generate for each signal.
+        fs (float): Sampling frequency.
+        rng (np.random.Generator): Random generator, for reproducible noise. Defaults to the module generator.
+
+    Returns:
+        np.array: Combined background noises in μPa, shape (n_signals, n_samples).
+
+    Raises:
+        UnboundLocalError: Raised if seas, rains and shippings have different lengths.
+
+    """
+    if not len(seas) == len(rains) == len(shippings):
+        raise UnboundLocalError("for generate_bg_noise_batch seas, rains and shippings must have the same length")
+
+    n_fft = scipy_fft.next_fast_len(n_samples, real=True)
+    responses = np.empty((len(seas), n_fft//2 + 1), dtype=np.float32)
+    for response, sea, rain, shipping in zip(responses, seas, rains, shippings):
+        _bg_response(Sea(sea), Rain(rain), Shipping(shipping), n_fft, fs, out=response)
+    return _shape_noise(responses, n_samples, n_fft, rng)
 
 def generate_bg_spectrum(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping = Shipping.NONE, fs: float = 48000) -> np.array:
     """Generate the combined frequency spectrum of rain and sea state.
@@ -250,6 +363,12 @@ def generate_bg_spectrum(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping =
         np.array: Combined frequency spectrum in dB ref 1μPa @1m/Hz.
 
     """
+    frequencies, spectrum = _bg_spectrum(sea, rain, shipping, fs)
+    return frequencies.copy(), spectrum.copy()
+
+@functools.lru_cache(maxsize=128)
+def _bg_spectrum(sea: Sea, rain: Rain, shipping: Shipping, fs: float) -> [np.array, np.array]:
+    """Combined frequency spectrum of generate_bg_spectrum, cached by its arguments."""
 
     # Calculando o espectro para cada condição
     frequencies1, spectrum1 = rain.get_spectrum()
@@ -264,16 +383,21 @@ def generate_bg_spectrum(sea: Sea, rain: Rain = Rain.NONE, shipping: Shipping =
     if index > 0:
         all_frequencies = all_frequencies[:index]
 
-    interpolated_spectrum1 = np.interp(all_frequencies, frequencies1, spectrum1, left=0, right=0)
-    interpolated_spectrum2 = np.interp(all_frequencies, frequencies2, spectrum2, left=0, right=0)
-    interpolated_spectrum3 = np.interp(all_frequencies, frequencies3, spectrum3, left=0, right=0)
-
-    # Calculando a soma linear das intensidade
-    linear1 = 10**(interpolated_spectrum1 / 20)
-    linear2 = 10**(interpolated_spectrum2 / 20)
-    linear3 = 10**(interpolated_spectrum3 / 20)
-    interpolated_spectrum = 20 * np.log10(linear1 + linear2 + linear3)
-
+    spectra = np.stack([
+        np.interp(all_frequencies, frequencies1, spectrum1, left=0, right=0),
+        np.interp(all_frequencies, frequencies2, spectrum2, left=0, right=0),
+        np.interp(all_frequencies, frequencies3, spectrum3, left=0, right=0),
+    ])
+
+    # Calculando a soma linear das intensidade, convertendo as três condições em uma única passada
+    np.multiply(spectra, 1/20, out=spectra)
+    np.power(10.0, spectra, out=spectra)
+    interpolated_spectrum = np.sum(spectra, axis=0)
+    np.log10(interpolated_spectrum, out=interpolated_spectrum)
+    np.multiply(interpolated_spectrum, 20, out=interpolated_spectrum)
+
+    all_frequencies.setflags(write=False)
+    interpolated_spectrum.setflags(write=False)
     return all_frequencies, interpolated_spectrum
 
 def estimate_spectrum(signal: np.array, window_size: int = 1024, overlap: float = 0.5, fs: float = 48000) -> [np.array, np.array]:
@@ -294,22 +418,17 @@ def estimate_spectrum(signal: np.array, window_size: int = 1024, overlap: float
         raise UnboundLocalError("Overlap cannot be 1")
 
     window_size = int(window_size)
-    n_samples = signal.size
     novity_samples = int(window_size * (1-overlap))
 
-    fft_result = np.zeros(window_size//2)
-    fft_freq = np.fft.fftfreq(window_size, 1/fs)[:window_size//2]
-
-    i=0
-    n_means = 0
-    while i + novity_samples + window_size <= n_samples:
-        fft_result = fft_result + np.abs(np.fft.fft(
-                    signal[i:i+window_size], norm='ortho')
-                [:window_size//2])
-        i += novity_samples
-        n_means += 1
-
-    fft_result = fft_result/n_means
-    fft_result = 20 * np.log10(fft_result)
+    # periodograma médio de Welch com janela retangular; a densidade é convertida para a potência por bin
+    #   de uma fft normalizada (norm='ortho'), mesma escala usada na geração dos ruídos
+    signal = signal.astype(np.float32, copy=False)
+    fft_freq, psd = scipy_signal.welch(signal, fs=fs, window='boxcar', nperseg=window_size,
+                                       noverlap=window_size - novity_samples, detrend=False,
+                                       scaling='density', average='mean')
+    fft_freq = fft_freq[:window_size//2]
+    # a densidade unilateral dobra todos os bins exceto o DC; dobrando-o também, todos ficam na mesma escala
+    psd[0] *= 2
+    fft_result = 10 * np.log10(psd[:window_size//2] * fs/2)
 
     return fft_freq, fft_result
@@ -0,0 +1,34 @@
+"""Spectrum Tables Build Program
+
+This program converts the csv spectrum tables of this folder (rain, sea state and shipping noise) into the single
+tables.npz file loaded by labsonar_synthesis.background, avoiding text parsing at runtime.
+It must be run again whenever a csv table is changed.
+
+"""
+import os
+import numpy as np
+
+
+TABLES = {
+    "rain": "rain.csv",
+    "sea": "sea_state.csv",
+    "shipping": "shipping_noise.csv",
+}
+
+
+def main():
+    """Main function for the spectrum tables build program."""
+
+    data_dir = os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(data_dir, "tables.npz")
+
+    # Cada tabela: primeira coluna com as frequências (Hz) e uma coluna por nível em dB ref 1μPa @1m/Hz
+    tables = {name: np.loadtxt(os.path.join(data_dir, csv), delimiter=",", skiprows=1, ndmin=2)
+              for name, csv in TABLES.items()}
+    np.savez(output_file, **tables)
+
+    print(f"Tables exported in {output_file}")
+
+
+if __name__ == "__main__":
+    main()
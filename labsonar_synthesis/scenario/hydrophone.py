@@ -1,27 +1,40 @@
+import numpy as np
+
+
 class Hydrophone:
     def __init__(self, position):
-        self._position = position
+        self._position = np.array(position, dtype=np.float64)
         self.movements = []
+        self._scenario = None
+        self._index = None
 
     @property
     def position(self):
-        return self._position
+        # cópia da posição: alterações só por update_position
+        if self._scenario is not None:
+            return self._scenario._hydro_xyz[self._index].copy()
+        return self._position.copy()
     
     @position.setter
     def position(self, value):
-        self._position = value
+        self.update_position(value)
 
 
     def calculate_movements(self, end_position, time_in_seconds, fps):
         total_frames = time_in_seconds * fps
-        dx = (end_position[0] - self._position[0]) / total_frames
-        dy = (end_position[1] - self._position[1]) / total_frames
-        dz = (end_position[2] - self._position[2]) / total_frames
-        self.movements = [(self._position[0] + dx * t, self._position[1] + dy * t, self._position[2] + dz * t) for t in range(total_frames + 1)]
+        self.movements = np.linspace(self.position, np.asarray(end_position, dtype=np.float64), total_frames + 1)
 
     def update_position(self, displacement):
-        self._position = displacement
+        if self._scenario is not None:
+            self._scenario._hydro_xyz[self._index] = displacement
+        else:
+            self._position = np.array(displacement, dtype=np.float64)
+
+    def _attach(self, scenario, index):
+        self._scenario = scenario
+        self._index = index
 
 
     def calculate_distance(self, source_position):
-        return sum((sp - hp) ** 2 for sp, hp in zip(source_position, self.position)) ** 0.5
+        diff = np.asarray(source_position, dtype=np.float64) - self.position
+        return float(np.sqrt(diff @ diff))
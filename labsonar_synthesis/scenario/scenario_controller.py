@@ -20,14 +20,25 @@ Example of usage:
 """
 
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from matplotlib.animation import FuncAnimation, FFMpegWriter, PillowWriter
 import numpy as np
 import plotly.graph_objects as go
 import os
+import functools
+from scipy.spatial.distance import cdist
 from labsonar_synthesis.scenario.ship import Ship
 from labsonar_synthesis.scenario.hydrophone import Hydrophone
 
 
+@functools.lru_cache(maxsize=32)
+def _pairwise_distances(ship_xyz, hydro_xyz, squared):
+    ships = np.frombuffer(ship_xyz).reshape(-1, 3)
+    hydrophones = np.frombuffer(hydro_xyz).reshape(-1, 3)
+    distances = cdist(ships, hydrophones, metric='sqeuclidean' if squared else 'euclidean')
+    distances.setflags(write=False)
+    return distances
+
+
 class ScenarioController:
     def __init__(self, dimension=3, max_draft=10):
         """
@@ -44,6 +55,8 @@ class ScenarioController:
               _height (float): Dynamic height of the scenario, used in 3D scenarios.
               _max_draft (int): Maximum draft depth for objects type ships.
               _objects (list): List to store objects like ships and hydrophones.
+              _ship_xyz (np.ndarray): Positions of the ships, one row (x, y, z) per ship in the order they were added.
+              _hydro_xyz (np.ndarray): Positions of the hydrophones, one row (x, y, z) per hydrophone in the order they were added.
         """
         if dimension not in [2, 3]:
             raise ValueError("A dimensão deve ser 2 ou 3.")
@@ -53,22 +66,106 @@ class ScenarioController:
         self._height = -1 if dimension == 3 else None
         self._max_draft = max_draft
         self._objects = []
+        # posições em arrays contíguos (SoA) com capacidade dobrada a cada realocação
+        self._ship_buffer = np.empty((0, 3))
+        self._hydro_buffer = np.empty((0, 3))
+        self._n_ships = 0
+        self._n_hydros = 0
+
+    @property
+    def _ship_xyz(self):
+        return self._ship_buffer[:self._n_ships]
+
+    @property
+    def _hydro_xyz(self):
+        return self._hydro_buffer[:self._n_hydros]
+
+    @property
+    def ships(self):
+        return [obj for obj in self._objects if isinstance(obj, Ship)]
+
+    @property
+    def hydrophones(self):
+        return [obj for obj in self._objects if isinstance(obj, Hydrophone)]
 
     def add_object(self, obj):
         """
           Add an object (e.g., ship or hydrophone) to the scenario.
 
           Args:
-              obj (Object): The object to be added to the scenario. Expected to have a 'position' attribute.
+              obj (Object): The object to be added to the scenario. Expected to have a 'position' attribute (tuple or np.ndarray).
 
           Updates:
               _objects (list): Appends the new object to the scenario's object list.
+              _ship_xyz, _hydro_xyz (np.ndarray): Appends the position of a ship or hydrophone as a new row.
               _width, _depth, _height (float): Updates the scenario dimensions based on the object's position.
         """
-        if not hasattr(obj, 'position') or not isinstance(obj.position, tuple):
-            raise ValueError("O objeto deve ter um atributo 'position' do tipo tupla.")
-        self._objects.append(obj)
-        self._update_dimensions(obj.position)
+        self.add_objects([obj])
+
+    def add_objects(self, objs):
+        """
+          Add several objects (e.g., ships and hydrophones) to the scenario at once.
+
+          Args:
+              objs (list): The objects to be added to the scenario. Each one is expected to have a 'position' attribute (tuple or np.ndarray).
+
+          Updates:
+              _objects (list): Appends the new objects to the scenario's object list.
+              _ship_xyz, _hydro_xyz (np.ndarray): Appends the positions of the ships and hydrophones as new rows.
+              _width, _depth, _height (float): Updates the scenario dimensions based on the largest coordinates of the objects.
+        """
+        if len(objs) == 0:
+            return
+        for obj in objs:
+            if not hasattr(obj, 'position') or not isinstance(obj.position, (tuple, np.ndarray)):
+                raise ValueError("O objeto deve ter um atributo 'position' do tipo tupla ou np.ndarray.")
+        try:
+            coords = np.asarray([obj.position for obj in objs])
+        except ValueError:  # posições com números diferentes de coordenadas
+            coords = None
+        if coords is None or coords.ndim != 2 or coords.shape[1] != 3 or not np.issubdtype(coords.dtype, np.number):
+            raise ValueError("As coordenadas da posição devem ser números inteiros ou flutuantes.")
+        self._update_dimensions(coords.max(axis=0).tolist())
+
+        self._objects.extend(objs)
+
+        ships = [obj for obj in objs if isinstance(obj, Ship)]
+        ship_mask = np.array([isinstance(obj, Ship) for obj in objs], dtype=bool)
+        self._ship_buffer = self._append_rows(self._ship_buffer, self._n_ships, coords[ship_mask])
+        for index, ship in enumerate(ships, start=self._n_ships):
+            ship._attach(self, index)
+        self._n_ships += len(ships)
+
+        hydrophones = [obj for obj in objs if isinstance(obj, Hydrophone)]
+        hydrophone_mask = np.array([isinstance(obj, Hydrophone) for obj in objs], dtype=bool)
+        self._hydro_buffer = self._append_rows(self._hydro_buffer, self._n_hydros, coords[hydrophone_mask])
+        for index, hydrophone in enumerate(hydrophones, start=self._n_hydros):
+            hydrophone._attach(self, index)
+        self._n_hydros += len(hydrophones)
+
+    @staticmethod
+    def _append_rows(buffer, n_rows, rows):
+        # realocando com o dobro da capacidade apenas quando necessário (custo amortizado constante)
+        if n_rows + len(rows) > len(buffer):
+            new_buffer = np.empty((max(n_rows + len(rows), 2 * len(buffer)), 3))
+            new_buffer[:n_rows] = buffer[:n_rows]
+            buffer = new_buffer
+        buffer[n_rows:n_rows + len(rows)] = rows
+        return buffer
+
+    def pairwise_distances(self, squared=False):
+        """
+          Compute the distances between every ship and every hydrophone in the scenario.
+
+          Args:
+              squared (bool, optional): Return squared distances, skipping the square root (enough to compare or sort distances). Defaults to False.
+
+          Returns:
+              np.ndarray: Matrix (n_ships, n_hydrophones) of euclidean distances, ordered as the ships and hydrophones properties.
+        """
+        # geometria pura: resultado reaproveitado enquanto as posições não mudarem (chave: bytes das posições)
+        distances = _pairwise_distances(self._ship_xyz.tobytes(), self._hydro_xyz.tobytes(), squared)
+        return distances.copy()
 
     def _update_dimensions(self, position):
         if not all(isinstance(coord, (int, float)) for coord in position):
@@ -79,24 +176,36 @@ class ScenarioController:
         if self._dimension == 3 and self._height < z: self._height = z + 50
 
 
-    def simulate_movement(self, ship_movements, hydrophone_movements):
+    def simulate_movement(self, ship_movements, hydrophone_movements, time_in_seconds=1):
         """
             Simulate the movement of ships and hydrophones within the scenario.
 
             Args:
-                ship_movements (dict): A dictionary mapping ships to their movement instructions.
-                hydrophone_movements (dict): A dictionary mapping hydrophones to their movement instructions.
+                ship_movements (dict): A dictionary mapping ships to their movement instructions (end_position, velocity).
+                hydrophone_movements (dict): A dictionary mapping hydrophones to their movement instructions (end_position, velocity).
+                time_in_seconds (float, optional): Elapsed time of the simulation step. Defaults to 1.
 
             Processes:
-                Iterates through each object in the respective movement dictionaries, updating their positions.
+                Moves every object towards its end position by velocity * time_in_seconds, without passing it,
+                updating all positions of each kind in a single vectorized operation.
                 Detects interactions or noise based on the new positions (not implemented in initial version).
         """
-        for obj, movements in ship_movements.items():
-            if obj in self._objects:
-                obj.move(self, movements)
-        for obj, movements in hydrophone_movements.items():
-            if obj in self._objects:
-                obj.move(self, movements)
+        self._move(self._ship_xyz, ship_movements, time_in_seconds)
+        self._move(self._hydro_xyz, hydrophone_movements, time_in_seconds)
+
+    def _move(self, xyz, movements, time_in_seconds):
+        objs = [obj for obj, movement in movements.items() if movement and getattr(obj, '_scenario', None) is self]
+        if len(objs) == 0:
+            return
+        index = np.array([obj._index for obj in objs])
+        end_positions = np.array([movements[obj][0] for obj in objs], dtype=np.float64)
+        velocities = np.array([movements[obj][1] for obj in objs], dtype=np.float64)
+
+        delta = end_positions - xyz[index]
+        distance = np.linalg.norm(delta, axis=1)
+        step = np.minimum(velocities * time_in_seconds, distance)
+        ratio = np.divide(step, distance, out=np.zeros_like(step), where=distance > 0)
+        xyz[index] += delta * ratio[:, np.newaxis]
     
 
     def animate_movement(self, ship_movements, hydrophone_movements, filename='movement.gif', fps=20):
@@ -106,12 +215,19 @@ class ScenarioController:
             Args:
                 ship_movements (dict): A dictionary mapping ships to their movement instructions.
                 hydrophone_movements (dict): A dictionary mapping hydrophones to their movement instructions.
-                filename (str, optional): The filename for saving the animation. Defaults to 'movement.gif'.
+                filename (str, optional): The filename for saving the animation, '.mp4' (encoded by ffmpeg with libx264) or any format written by Pillow (e.g. '.gif', '.webp', '.apng'). Defaults to 'movement.gif'.
                 fps (int, optional): Frames per second for the animation. Defaults to 20.
 
             Returns:
-                Saves an animated GIF to the specified filename showing the movement of objects in the scenario.
+                Saves an animation to the specified filename showing the movement of objects in the scenario.
         """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.mp4':
+            # ffmpeg codifica em outro processo, recebendo os quadros RGB por pipe
+            writer = FFMpegWriter(fps=fps, codec='libx264', bitrate=4000, extra_args=['-pix_fmt', 'yuv420p'])
+        else:
+            writer = PillowWriter(fps=fps)
+
         fig = plt.figure()
         ax = fig.add_subplot(111, projection='3d')
         ax.set_xlim(0, self._width)
@@ -126,59 +242,67 @@ class ScenarioController:
         hydrophones = [ax.plot([], [], [], 'r+')[0] for _ in hydrophone_movements]
 
         def calculate_movements(start_position, end_position, velocity, fps):
+          start_position = np.asarray(start_position, dtype=np.float64)
+          end_position = np.asarray(end_position, dtype=np.float64)
           if velocity == 0:  
-              return [start_position]  
-          distance = np.linalg.norm(np.array(end_position) - np.array(start_position))
+              return start_position[np.newaxis, :]
+          distance = np.linalg.norm(end_position - start_position)
           time_in_seconds = distance / velocity
-          total_frames = int(time_in_seconds * fps)  # Garantindo que seja inteiro
-          dx = (end_position[0] - start_position[0]) / total_frames
-          dy = (end_position[1] - start_position[1]) / total_frames
-          dz = (end_position[2] - start_position[2]) / total_frames
-          return [(start_position[0] + dx * t, start_position[1] + dy * t, start_position[2] + dz * t) for t in range(total_frames)]
+          total_frames = max(int(time_in_seconds * fps), 1)  # Garantindo que seja inteiro e ao menos 1 quadro
+          # trajetória (total_frames, 3) sem incluir a posição final
+          return np.linspace(start_position, end_position, total_frames, endpoint=False)
+
+        def calculate_trajectory(obj, movement):
+          if not movement:
+              return np.asarray(obj.position, dtype=np.float64)[np.newaxis, :]
+          end_position, velocity = movement
+          obj.movements = calculate_movements(obj.position, end_position, velocity, fps)
+          return obj.movements
+
+        # Calculando as trajetórias uma única vez, antes da animação
+        ship_trajectories = [calculate_trajectory(ship, movement) for ship, movement in ship_movements.items()]
+        hydrophone_trajectories = [calculate_trajectory(hydrophone, movement) for hydrophone, movement in hydrophone_movements.items()]
+        # Linha vertical de cada navio até o fundo por quadro: x, y e z com 2 pontos cada, (total_frames, 3, 2)
+        ship_line_trajectories = [
+            np.stack([np.repeat(trajectory[:, 0:1], 2, axis=1),
+                      np.repeat(trajectory[:, 1:2], 2, axis=1),
+                      np.column_stack([np.full(len(trajectory), self._height), trajectory[:, 2]])], axis=1)
+            for trajectory in ship_trajectories
+        ]
 
+        ship_lines = [ax.plot([], [], [], 'g-')[0] for _ in ship_movements]
 
         def init():
-            for plot in ships + hydrophones:
+            for plot in ships + ship_lines + hydrophones:
                 plot.set_data([], [])
                 plot.set_3d_properties([])
-            return ships + hydrophones
-
-        ship_lines = [ax.plot([], [], [], 'g-')[0] for _ in ship_movements]
+            return ships + ship_lines + hydrophones
 
         def update(frame):
-          for ship_plot, ship_line, ship in zip(ships, ship_lines, ship_movements):
-              if ship in ship_movements and ship_movements[ship]:
-                  end_position, velocity = ship_movements[ship]
-                  if frame == 0:
-                      start_position = ship.position
-                      ship_velocity = velocity
-                      ship.movements = calculate_movements(start_position, end_position, ship_velocity, fps)
-                  if frame < len(ship.movements):
-                      ship.position = ship.movements[frame]
-              ship_plot.set_data([ship.position[0]], [ship.position[1]])
-              ship_plot.set_3d_properties([ship.position[2]])
+          # fatias dos arrays pré-calculados, sem alocar listas a cada quadro
+          for ship_plot, ship_line, ship, trajectory, line_trajectory in zip(ships, ship_lines, ship_movements, ship_trajectories, ship_line_trajectories):
+              index = min(frame, len(trajectory) - 1)
+              point = trajectory[index:index + 1]
+              ship.position = trajectory[index]
+              ship_plot.set_data(point[:, 0], point[:, 1])
+              ship_plot.set_3d_properties(point[:, 2])
 
               # Desenhar a linha vertical do navio até o fundo
-              ship_line.set_data([ship.position[0], ship.position[0]], [ship.position[1], ship.position[1]])
-              ship_line.set_3d_properties([self._height, ship.position[2]])  # Altura zero representa o fundo
-
-          for hydrophone_plot, hydrophone in zip(hydrophones, hydrophone_movements):
-              if hydrophone in hydrophone_movements and hydrophone_movements[hydrophone]:
-                  end_position, velocity = hydrophone_movements[hydrophone]
-                  if frame == 0:
-                      start_position = hydrophone.position
-                      hydrophone_velocity = velocity
-                      hydrophone.movements = calculate_movements(start_position, end_position, hydrophone_velocity, fps)
-                  if frame < len(hydrophone.movements):
-                      hydrophone.position = hydrophone.movements[frame]
-              hydrophone_plot.set_data([hydrophone.position[0]], [hydrophone.position[1]])
-              hydrophone_plot.set_3d_properties([hydrophone.position[2]])
+              ship_line.set_data(line_trajectory[index, 0], line_trajectory[index, 1])
+              ship_line.set_3d_properties(line_trajectory[index, 2])  # Altura zero representa o fundo
+
+          for hydrophone_plot, hydrophone, trajectory in zip(hydrophones, hydrophone_movements, hydrophone_trajectories):
+              index = min(frame, len(trajectory) - 1)
+              point = trajectory[index:index + 1]
+              hydrophone.position = trajectory[index]
+              hydrophone_plot.set_data(point[:, 0], point[:, 1])
+              hydrophone_plot.set_3d_properties(point[:, 2])
 
           return ships + ship_lines +hydrophones
 
         total_frames = int(15 * fps)  # Duração total da animação em frames (inteiro)
         ani = FuncAnimation(fig, update, frames=total_frames, init_func=init, blit=True, repeat=False)
-        ani.save(filename, writer='pillow', fps=fps)  # Salvando com o Pillow
+        ani.save(filename, writer=writer)
         plt.close(fig)
 
 
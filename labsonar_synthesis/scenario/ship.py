@@ -1,29 +1,37 @@
+import numpy as np
+
+
 class Ship:
     def __init__(self, position):
         """
             Initialize a Ship object with a starting position.
 
             Args:
-                position (tuple): A tuple of 2 (for 2D) or 3 (for 3D) coordinates representing the initial position of the ship.
+                position (tuple or np.ndarray): 2 (for 2D) or 3 (for 3D) coordinates representing the initial position of the ship.
 
             Raises:
                 ValueError: If the position tuple does not have 2 or 3 elements.
         """
         if len(position) == 2:  
-            self._position = position + (0,)  
+            self._position = np.append(np.array(position, dtype=np.float64), 0.0)
         elif len(position) == 3:  
-            self._position = position
+            self._position = np.array(position, dtype=np.float64)
         else:
             raise ValueError("A posição deve ser uma tupla de 2 ou 3 coordenadas.")
         self.movements = []
+        self._scenario = None
+        self._index = None
 
     @property
     def position(self):
-        return self._position
+        # cópia da posição: alterações só por update_position
+        if self._scenario is not None:
+            return self._scenario._ship_xyz[self._index].copy()
+        return self._position.copy()
 
     @position.setter
     def position(self, value):
-        self._position = value
+        self.update_position(value)
 
     def calculate_movements(self, end_position, time_in_seconds, fps):
         """
@@ -35,10 +43,7 @@ class Ship:
                 fps (int): Frames per second, used to determine the total number of increments.
          """
         total_frames = time_in_seconds * fps
-        dx = (end_position[0] - self._position[0]) / total_frames
-        dy = (end_position[1] - self._position[1]) / total_frames
-        dz = (end_position[2] - self._position[2]) / total_frames
-        self.movements = [(self._position[0] + dx * t, self._position[1] + dy * t, self._position[2] + dz * t) for t in range(total_frames + 1)]
+        self.movements = np.linspace(self.position, np.asarray(end_position, dtype=np.float64), total_frames + 1)
 
     def update_position(self, displacement):
         """
@@ -47,11 +52,26 @@ class Ship:
             Args:
                 displacement (tuple): A tuple of 2 or 3 coordinates representing the new position of the ship.
         """
-        self._position = displacement
+        if self._scenario is not None:
+            self._scenario._ship_xyz[self._index] = displacement
+        else:
+            self._position = np.array(displacement, dtype=np.float64)
+
+    def _attach(self, scenario, index):
+        """
+            Bind the ship to its row of the scenario's ship position array, which holds the ship's position from then on.
+
+            Args:
+                scenario (ScenarioController): The scenario the ship was added to.
+                index (int): Row of the ship in the scenario's ship position array.
+        """
+        self._scenario = scenario
+        self._index = index
 
 
     def calculate_distance(self, source_position):
-        return sum((sp - hp) ** 2 for sp, hp in zip(source_position, self.position)) ** 0.5
+        diff = np.asarray(source_position, dtype=np.float64) - self.position
+        return float(np.sqrt(diff @ diff))
 
 
 
@@ -11,5 +11,5 @@ setup(
     # setup_requires=['pytest-runner'],
     # tests_require=['pytest==4.4.1'],
     # test_suite='tests',
-    package_data={'labsonar_synthesis': ['data/*.csv']},
+    package_data={'labsonar_synthesis': ['data/*.csv', 'data/tables.npz']},
 )
\ No newline at end of file
@@ -5,14 +5,105 @@ It generates background noise for various combinations of sea state, rain, and s
 
 """
 import os
+import mmap
+import struct
+import functools
+import itertools
+import concurrent.futures
 import numpy as np
-import scipy.io.wavfile as scipy_wav
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
-import labsonar_sp.analysis as sp_analysis
 import labsonar_synthesis.background as syn_bg
 
 
+def write_wav_int16_mmap(path, fs, samples):
+    """Write a mono 16-bit PCM WAV file, filling the data directly in a memory map of the file.
+
+    The file is preallocated to its final size before being mapped.
+
+    Args:
+        path (str): Output file path.
+        fs (int): Sampling frequency.
+        samples (np.array): int16 samples.
+    """
+    data_bytes = samples.nbytes
+    total = 44 + data_bytes
+    fd = os.open(path, os.O_CREAT | os.O_RDWR | os.O_TRUNC, 0o644)
+    try:
+        # reservando todos os blocos do arquivo de uma vez (posix_fallocate não existe no macOS)
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, total)
+        else:
+            os.ftruncate(fd, total)
+        file_map = mmap.mmap(fd, total)
+    finally:
+        os.close(fd)
+    wav = np.frombuffer(file_map, dtype=np.uint8)
+    # Cabeçalho PCM canônico de 44 bytes: RIFF, fmt (PCM, 1 canal, 16 bits) e data
+    struct.pack_into('<4sI4s4sIHHIIHH4sI', wav, 0,
+                     b'RIFF', 36 + data_bytes, b'WAVE',
+                     b'fmt ', 16, 1, 1, int(fs), int(fs) * 2, 2, 16,
+                     b'data', data_bytes)
+    wav[44:].view(np.int16)[:] = samples
+    del wav
+    file_map.flush()
+    file_map.close()
+
+
+def normalize_to_int16(noise):
+    """Scale a signal to the full 16-bit range, writing the int16 samples without a float intermediate.
+
+    Args:
+        noise (np.array): Signal to normalize.
+
+    Returns:
+        np.array: int16 samples, with the peak of the signal mapped to 32767 (zeros for an all-zero signal).
+    """
+    # máximo absoluto pelos extremos, sem alocar |noise|
+    peak = max(np.max(noise), -np.min(noise))
+    samples = np.empty(noise.shape, dtype=np.int16)
+    if peak == 0:
+        # sinal nulo: sem escala a aplicar
+        samples.fill(0)
+        return samples
+    # escala e conversão numa única passada, escrevendo direto no buffer int16
+    np.multiply(noise, 32767 / peak, out=samples, casting='unsafe')
+    return samples
+
+
+@functools.lru_cache(maxsize=None)
+def spectrum_figure():
+    """Figure and axes reused by every case plotted in the current process."""
+    return plt.subplots(figsize=(12, 6))
+
+
+def run_case(shipping, sea_state, rain, noise, fs, base_dir):
+    """Compare the spectrum of a generated background noise with the desired one and save the noise as a WAV file."""
+
+    # Define output file paths
+    output_wav = f"{base_dir}/bg-{shipping}_{sea_state}_{rain}_audio.wav"
+    output_png = f"{base_dir}/bg-{shipping}_{sea_state}_{rain}_spectrum.png"
+
+    # Desired spectrum and estimated spectrum for comparison
+    frequencies, desired_spectrum = syn_bg.generate_bg_spectrum(sea_state, rain, shipping, fs=fs)
+    fft_freq, fft_result = syn_bg.estimate_spectrum(noise, noise.size/1000, overlap=0.5, fs=fs)
+
+    # Plot and save the spectrum for comparison
+    fig, ax = spectrum_figure()
+    ax.clear()
+    ax.plot(fft_freq, fft_result, label='Test Spectrum')
+    ax.plot(frequencies, desired_spectrum, linestyle='--', label='Desired Spectrum')
+    ax.set_xlabel('Frequency (Hz)')
+    ax.set_ylabel('Amplitude (dB)')
+    ax.legend()
+    fig.savefig(output_png)
+
+    # Save the generated noise as a 16-bit WAV file, normalized to full scale
+    write_wav_int16_mmap(output_wav, fs, normalize_to_int16(noise))
+
+
 def main():
     """Main function for the background noise generation test program."""
     
@@ -21,36 +112,21 @@ def main():
     if not os.path.exists(base_dir):
         os.mkdir(base_dir)
 
-    # Iterate over different combinations of sea state, rain, and shipping noise levels
-    for shipping in [syn_bg.Shipping.NONE, syn_bg.Shipping.LEVEL_7]:
-        for sea_state in [syn_bg.Sea.STATE_0, syn_bg.Sea.STATE_6]:
-            for rain in [syn_bg.Rain.NONE, syn_bg.Rain.VERY_HEAVY]:
-
-                # Define output file paths
-                output_wav = f"{base_dir}/bg-{shipping}_{sea_state}_{rain}_audio.wav"
-                output_png = f"{base_dir}/bg-{shipping}_{sea_state}_{rain}_spectrum.png"
-
-                # Set parameters for noise generation
-                fs = 48000
-                n_samples = 100 * fs
-
-                # Generate background noise and desired spectrum for comparison
-                noise = syn_bg.generate_bg_noise(sea_state, rain, shipping, n_samples=n_samples, fs=fs)
-                frequencies, desired_spectrum = syn_bg.generate_bg_spectrum(sea_state, rain, shipping, fs=fs)
-                fft_freq, fft_result = syn_bg.estimate_spectrum(noise, n_samples/1000, overlap=0.5, fs=fs)
-
-                # Plot and save the spectrum for comparison
-                plt.figure(figsize=(12, 6))
-                plt.plot(fft_freq, fft_result, label='Test Spectrum')
-                plt.plot(frequencies, desired_spectrum, linestyle='--', label='Desired Spectrum')
-                plt.xlabel('Frequency (Hz)')
-                plt.ylabel('Amplitude (dB)')
-                plt.legend()
-                plt.savefig(output_png)
-                plt.close()
-
-                # Save the generated noise as a WAV file
-                scipy_wav.write(output_wav, fs, sp_analysis.normalize(noise, 1))
+    # Set parameters for noise generation
+    fs = 48000
+    n_samples = 100 * fs
+
+    # Generate background noise for all combinations of sea state, rain, and shipping noise levels at once
+    cases = list(itertools.product([syn_bg.Shipping.NONE, syn_bg.Shipping.LEVEL_7],
+                                   [syn_bg.Sea.STATE_0, syn_bg.Sea.STATE_6],
+                                   [syn_bg.Rain.NONE, syn_bg.Rain.VERY_HEAVY]))
+    shippings, sea_states, rains = zip(*cases)
+    noises = syn_bg.generate_bg_noise_batch(sea_states, rains, shippings, n_samples=n_samples, fs=fs)
+
+    # Analyze and export the independent cases in parallel processes
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(len(cases), os.cpu_count() or 1)) as executor:
+        list(executor.map(run_case, shippings, sea_states, rains, noises,
+                          itertools.repeat(fs), itertools.repeat(base_dir)))
 
     print(f"Output files generated in {base_dir}")
 
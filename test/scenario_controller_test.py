@@ -4,15 +4,14 @@ This program utilizes the ScenarioController module to simulate and visualize na
 It includes the addition and movement simulation of various objects like ships and hydrophones in a predefined environment.
 
 """
-import random
+import matplotlib.animation
+import numpy as np
 from labsonar_synthesis.scenario.scenario_controller import ScenarioController
 from labsonar_synthesis.scenario.ship import Ship
 from labsonar_synthesis.scenario.hydrophone import Hydrophone
 
-
-def create_random_position(dimension):
-    """Generate a random position in the scenario."""
-    return tuple(random.uniform(0, 100) for _ in range(dimension))
+# Fixed seed: the same scenario geometry on every run
+SEED = 0xB0A7
 
 
 def main():
@@ -20,23 +19,28 @@ def main():
 
     # Initialize the ScenarioController
     dimension = 3
+    n_ships = 5
+    n_hydrophones = 5
     scenario = ScenarioController(dimension=dimension)
 
+    # Generate all random positions at once: initial and target positions of ships and hydrophones
+    rng = np.random.default_rng(SEED)
+    positions = rng.uniform(0, 100, size=(2 * (n_ships + n_hydrophones), dimension))
+    ship_positions, hydrophone_positions, ship_targets, hydrophone_targets = np.split(
+        positions, np.cumsum([n_ships, n_hydrophones, n_ships]))
+
     # Create and add ships and hydrophones to the scenario
-    for _ in range(5):
-        ship_position = create_random_position(dimension)
-        hydrophone_position = create_random_position(dimension)
-        ship = Ship(ship_position)
-        hydrophone = Hydrophone(hydrophone_position)
-        scenario.add_object(ship)
-        scenario.add_object(hydrophone)
+    objects = [Ship(position) for position in ship_positions] + [Hydrophone(position) for position in hydrophone_positions]
+    scenario.add_objects(objects)
 
     # Define movements for ships and hydrophones
+    ship_velocities = rng.uniform(0, 10, size=n_ships)
+    hydrophone_velocities = rng.uniform(0, 5, size=n_hydrophones)
     ship_movements = {
-        ship: (create_random_position(dimension), random.uniform(0, 10)) for ship in scenario.ships
+        ship: (target, velocity) for ship, target, velocity in zip(scenario.ships, ship_targets, ship_velocities)
     }
     hydrophone_movements = {
-        hydrophone: (create_random_position(dimension), random.uniform(0, 5)) for hydrophone in scenario.hydrophones
+        hydrophone: (target, velocity) for hydrophone, target, velocity in zip(scenario.hydrophones, hydrophone_targets, hydrophone_velocities)
     }
 
     # Simulate movements
@@ -44,7 +48,9 @@ def main():
 
     # Visualize the scenario
     scenario.plot_components(dimension=dimension)
-    scenario.animate_movement(ship_movements, hydrophone_movements, filename='scenario_animation.gif')
+    # MP4 (ffmpeg/libx264) when ffmpeg is installed, GIF (Pillow) otherwise
+    extension = 'mp4' if matplotlib.animation.writers.is_available('ffmpeg') else 'gif'
+    scenario.animate_movement(ship_movements, hydrophone_movements, filename=f'scenario_animation.{extension}')
 
     print("Scenario simulation and visualization completed.")
 